@@ -1,12 +1,146 @@
 import pandas as pd
 import numpy as np
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
-from typing import Tuple, Dict
+from typing import Tuple, Dict, Optional, Callable
+
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+try:
+    import numexpr as ne
+    HAS_NUMEXPR = True
+except ImportError:
+    HAS_NUMEXPR = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+REQUIRED_COLUMNS = ['phi_a', 'phi_b', 'preds_AB_0', 'preds_A_1B_0', 'preds_A_0B_1', 'preds_AB_1']
+PREDS_COLUMNS = REQUIRED_COLUMNS[2:]
+
+# Parquet schema metadata key recording which CSV a cache file was built from
+CACHE_SOURCE_KEY = b'ml_fold_source'
+
+# optimize_R formulas in numexpr syntax, keyed by gate type
+OPTIMIZE_R_EXPRESSIONS = {
+    'NOR': 'ab0 / (a1b0 * a0b1 * ab1)',
+    'NAND': '(ab0 * a1b0 * a0b1) / ab1'
+}
+
+def _nor_optimize_r(ab0, a1b0, a0b1, ab1):
+    """NumPy optimize_R for a NOR gate."""
+    return ab0 / (a1b0 * a0b1 * ab1)
+
+def _nand_optimize_r(ab0, a1b0, a0b1, ab1):
+    """NumPy optimize_R for a NAND gate."""
+    return (ab0 * a1b0 * a0b1) / ab1
+
+def _numexpr_optimize_r(expression, ab0, a1b0, a0b1, ab1):
+    """Evaluate an optimize_R expression with numexpr."""
+    return ne.evaluate(expression, local_dict={'ab0': ab0, 'a1b0': a1b0, 'a0b1': a0b1, 'ab1': ab1})
+
+_NUMPY_OPTIMIZE_R = {'NOR': _nor_optimize_r, 'NAND': _nand_optimize_r}
+
+if HAS_NUMBA:
+    @njit(parallel=True, cache=True, error_model='numpy')
+    def _nor_optimize_r_kernel(ab0, a1b0, a0b1, ab1):
+        """Compute NOR optimize_R row by row; division by zero yields inf like NumPy."""
+        out = np.empty(ab0.shape[0], dtype=ab0.dtype)
+        for i in prange(ab0.shape[0]):
+            out[i] = ab0[i] / (a1b0[i] * a0b1[i] * ab1[i])
+        return out
+
+    @njit(parallel=True, cache=True, error_model='numpy')
+    def _nand_optimize_r_kernel(ab0, a1b0, a0b1, ab1):
+        """Compute NAND optimize_R row by row; division by zero yields inf like NumPy."""
+        out = np.empty(ab0.shape[0], dtype=ab0.dtype)
+        for i in prange(ab0.shape[0]):
+            out[i] = (ab0[i] * a1b0[i] * a0b1[i]) / ab1[i]
+        return out
+
+    # Not every threading layer is safe for concurrent launches (workqueue
+    # aborts), so kernel calls are serialised; each is parallel internally.
+    _NUMBA_LOCK = threading.Lock()
+
+    def _numba_optimize_r(kernel, ab0, a1b0, a0b1, ab1):
+        """Run a Numba optimize_R kernel while holding the module-wide lock."""
+        with _NUMBA_LOCK:
+            return kernel(ab0, a1b0, a0b1, ab1)
+
+    _NUMBA_OPTIMIZE_R = {
+        'NOR': partial(_numba_optimize_r, _nor_optimize_r_kernel),
+        'NAND': partial(_numba_optimize_r, _nand_optimize_r_kernel)
+    }
+
+def warm_numba_kernels() -> None:
+    """
+    Compile (or load from cache) the Numba kernels for the float32 arrays produced by load_data.
+
+    Call this from the main thread before running pipelines in worker threads: it keeps the first
+    real call free of JIT cost, and some threading layers (e.g. TBB) hang at exit if their pool is
+    first started from a worker thread. Does nothing when Numba is not installed.
+    """
+    if not HAS_NUMBA:
+        return
+    warmup = np.ones(1, dtype=np.float32)
+    _nor_optimize_r_kernel(warmup, warmup, warmup, warmup)
+    _nand_optimize_r_kernel(warmup, warmup, warmup, warmup)
+
+def _select_optimize_r(gate_type: str) -> Callable:
+    """Pick the fastest available optimize_R implementation for a gate type."""
+    if HAS_NUMBA:
+        return _NUMBA_OPTIMIZE_R[gate_type]
+    if HAS_NUMEXPR:
+        return partial(_numexpr_optimize_r, OPTIMIZE_R_EXPRESSIONS[gate_type])
+    return _NUMPY_OPTIMIZE_R[gate_type]
+
+@dataclass
+class _Columns:
+    """Parallel column arrays (structure of arrays) used by the optimization pipeline."""
+    phi_a: np.ndarray
+    phi_b: np.ndarray
+    ab0: np.ndarray
+    a1b0: np.ndarray
+    a0b1: np.ndarray
+    ab1: np.ndarray
+    optimize_r: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> '_Columns':
+        """Extract the required columns of a DataFrame as NumPy arrays, with preds as float32."""
+        return cls(
+            df['phi_a'].to_numpy(),
+            df['phi_b'].to_numpy(),
+            *(df[col].to_numpy(dtype=np.float32) for col in PREDS_COLUMNS)
+        )
+
+    def filter(self, mask: np.ndarray) -> '_Columns':
+        """Return a new instance keeping only the rows where mask is True."""
+        return _Columns(
+            self.phi_a[mask], self.phi_b[mask],
+            self.ab0[mask], self.a1b0[mask], self.a0b1[mask], self.ab1[mask],
+            None if self.optimize_r is None else self.optimize_r[mask]
+        )
 
 class MLFoldOptimizer:
     """A class to optimize phase configurations for photonic logic gates using the ML-FOLD algorithm."""
     
-    def __init__(self, data_path: str, gate_type: str, threshold_fraction: float = 0.8):
+    def __init__(self, data_path: str, gate_type: str, threshold_fraction: float = 0.8,
+                 use_parquet_cache: bool = False):
         """
         Initialize the ML-FOLD optimizer.
         
@@ -14,6 +148,8 @@ class MLFoldOptimizer:
             data_path (str): Path to the CSV data file.
             gate_type (str): Type of logic gate ('NOR' or 'NAND').
             threshold_fraction (float, optional): Fraction of max optimize_R for threshold. Defaults to 0.8.
+            use_parquet_cache (bool, optional): Cache the parsed CSV as <name>.csv.parquet next to it
+                (requires pyarrow). Defaults to False.
         
         Raises:
             ValueError: If gate_type is invalid or data file is not found.
@@ -22,48 +158,112 @@ class MLFoldOptimizer:
             raise ValueError("gate_type must be 'NOR' or 'NAND'")
         self.gate_type = gate_type.upper()
         self.threshold_fraction = threshold_fraction
+        self._optimize_r_func = _select_optimize_r(self.gate_type)
         self.data_path = Path(data_path)
+        self.use_parquet_cache = use_parquet_cache and HAS_PYARROW
         self.df = None
+        self.cols = None
         self.max_optimize_r = None
         self.threshold = None
+        self._optimal_mask = None
         
         if not self.data_path.exists():
             raise FileNotFoundError(f"Data file not found at {self.data_path}")
 
     def load_data(self) -> None:
-        """Load phase configuration data from CSV file."""
+        """Load phase configuration data from CSV file, or from its Parquet cache if it matches the CSV."""
         try:
-            self.df = pd.read_csv(self.data_path)
-            required_columns = ['phi_a', 'phi_b', 'preds_AB_0', 'preds_A_1B_0', 'preds_A_0B_1', 'preds_AB_1']
-            if not all(col in self.df.columns for col in required_columns):
-                raise ValueError("CSV file must contain required columns: " + ", ".join(required_columns))
+            df = None
+            if self.use_parquet_cache:
+                # Stamp the CSV before parsing so the cache can never claim newer contents than it holds
+                signature = self._source_signature()
+                df = self._read_parquet_cache(signature)
+            if df is None:
+                df = self._read_csv()
+                # Skip the cache write if the CSV changed while it was being parsed
+                if self.use_parquet_cache and self._source_signature() == signature:
+                    self._write_parquet_cache(df, signature)
+            self.cols = _Columns.from_frame(df)
         except Exception as e:
             raise RuntimeError(f"Error loading data: {str(e)}")
 
+    def _read_csv(self) -> pd.DataFrame:
+        """Parse the required columns of the CSV file."""
+        # usecols raises on missing columns, so they are only looked up on failure
+        try:
+            return pd.read_csv(
+                self.data_path,
+                usecols=REQUIRED_COLUMNS,
+                dtype={col: np.float32 for col in PREDS_COLUMNS},
+                engine='pyarrow' if HAS_PYARROW else 'c'
+            )
+        except (ValueError, KeyError):  # the pyarrow engine raises a KeyError subclass
+            missing = set(REQUIRED_COLUMNS) - set(pd.read_csv(self.data_path, nrows=0).columns)
+            if missing:
+                raise ValueError("CSV file must contain required columns: " + ", ".join(REQUIRED_COLUMNS))
+            raise
+
+    @property
+    def _cache_path(self) -> Path:
+        """Parquet cache location; the full CSV name is kept so it cannot clash with user files."""
+        return self.data_path.with_name(self.data_path.name + '.parquet')
+
+    def _source_signature(self) -> bytes:
+        """Identify the current CSV contents by size and nanosecond mtime."""
+        stat = self.data_path.stat()
+        return json.dumps({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}).encode()
+
+    def _read_parquet_cache(self, signature: bytes) -> Optional[pd.DataFrame]:
+        """Return the cached data, or None if the cache is missing, unreadable or built from another CSV."""
+        try:
+            table = pq.read_table(self._cache_path, columns=REQUIRED_COLUMNS)
+            if (table.schema.metadata or {}).get(CACHE_SOURCE_KEY) != signature:
+                return None
+            return table.to_pandas()
+        except Exception:
+            return None
+
+    def _write_parquet_cache(self, df: pd.DataFrame, signature: bytes) -> None:
+        """Atomically write df to the Parquet cache, stamped with signature; failures are ignored."""
+        tmp_path = None
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            metadata = dict(table.schema.metadata or {})
+            metadata[CACHE_SOURCE_KEY] = signature
+            table = table.replace_schema_metadata(metadata)
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.data_path.parent, prefix=self._cache_path.name + '.',
+                                            suffix='.tmp')
+            os.close(fd)
+            pq.write_table(table, tmp_path, compression='zstd')
+            os.replace(tmp_path, self._cache_path)
+        except Exception:
+            # The cache is optional (read-only directory, pyarrow without zstd, ...)
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
     def calculate_optimize_r(self) -> None:
         """Calculate the optimize_R metric based on gate type."""
-        if self.df is None:
+        if self.cols is None:
             raise ValueError("Data not loaded. Call load_data() first.")
         
-        if self.gate_type == 'NOR':
-            self.df['optimize_R'] = self.df['preds_AB_0'] / (
-                self.df['preds_A_1B_0'] * self.df['preds_A_0B_1'] * self.df['preds_AB_1']
-            )
-        else:  # NAND
-            self.df['optimize_R'] = (
-                self.df['preds_AB_0'] * self.df['preds_A_1B_0'] * self.df['preds_A_0B_1']
-            ) / self.df['preds_AB_1']
-        
-        # Handle infinities and NaNs
-        self.df.replace([np.inf, -np.inf], np.nan, inplace=True)
-        self.df.dropna(subset=['optimize_R'], inplace=True)
+        ab0, a1b0, a0b1, ab1 = self.cols.ab0, self.cols.a1b0, self.cols.a0b1, self.cols.ab1
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            optimize_r = self._optimize_r_func(ab0, a1b0, a0b1, ab1)
+
+        # Drop rows whose metric is infinite or NaN
+        mask = np.isfinite(optimize_r)
+        self.cols.optimize_r = optimize_r
+        self.cols = self.cols.filter(mask)
+        optimize_r = self.cols.optimize_r
+        self.max_optimize_r = float(optimize_r.max()) if optimize_r.size else np.nan
 
     def set_threshold(self) -> None:
         """Set the classification threshold as a fraction of the maximum optimize_R."""
-        if self.df is None or 'optimize_R' not in self.df.columns:
+        if self.max_optimize_r is None:
             raise ValueError("optimize_R not calculated. Call calculate_optimize_r() first.")
         
-        self.max_optimize_r = self.df['optimize_R'].max()
         self.threshold = self.max_optimize_r * self.threshold_fraction
 
     def classify_configurations(self) -> None:
@@ -71,9 +271,7 @@ class MLFoldOptimizer:
         if self.threshold is None:
             raise ValueError("Threshold not set. Call set_threshold() first.")
         
-        self.df['classification'] = self.df['optimize_R'].apply(
-            lambda x: 'Optimal' if x >= self.threshold else 'Non-Optimal'
-        )
+        self._optimal_mask = self.cols.optimize_r >= self.threshold
 
     def get_results(self) -> Dict:
         """
@@ -82,28 +280,45 @@ class MLFoldOptimizer:
         Returns:
             Dict: Contains DataFrame, max optimize_R, threshold, and class counts.
         """
-        if self.df is None or 'classification' not in self.df.columns:
+        if self._optimal_mask is None:
             raise ValueError("Configurations not classified. Call classify_configurations() first.")
         
+        codes = self._optimal_mask.astype(np.int8)
+        self.df = pd.DataFrame({
+            'phi_a': self.cols.phi_a,
+            'phi_b': self.cols.phi_b,
+            'preds_AB_0': self.cols.ab0,
+            'preds_A_1B_0': self.cols.a1b0,
+            'preds_A_0B_1': self.cols.a0b1,
+            'preds_AB_1': self.cols.ab1,
+            'optimize_R': self.cols.optimize_r,
+            'classification': pd.Categorical.from_codes(codes, categories=['Non-Optimal', 'Optimal'])
+        })
+        
+        optimal_count = int(self._optimal_mask.sum())
         return {
             'dataframe': self.df,
             'max_optimize_r': self.max_optimize_r,
             'threshold': self.threshold,
-            'class_counts': self.df['classification'].value_counts().to_dict()
+            'class_counts': {
+                'Optimal': optimal_count,
+                'Non-Optimal': self._optimal_mask.size - optimal_count
+            }
         }
 
-def run_optimization(data_path: str, gate_type: str) -> Dict:
+def run_optimization(data_path: str, gate_type: str, use_parquet_cache: bool = False) -> Dict:
     """
     Run the ML-FOLD optimization pipeline.
     
     Args:
         data_path (str): Path to the CSV data file.
         gate_type (str): Type of logic gate ('NOR' or 'NAND').
+        use_parquet_cache (bool, optional): Cache the parsed CSV as Parquet next to it. Defaults to False.
     
     Returns:
         Dict: Optimization results including DataFrame and statistics.
     """
-    optimizer = MLFoldOptimizer(data_path, gate_type)
+    optimizer = MLFoldOptimizer(data_path, gate_type, use_parquet_cache=use_parquet_cache)
     optimizer.load_data()
     optimizer.calculate_optimize_r()
     optimizer.set_threshold()
@@ -117,11 +332,18 @@ if __name__ == "__main__":
         'NAND': 'data/nand_data.csv'
     }
     
-    for gate, path in data_paths.items():
-        print(f"\nProcessing {gate} gate...")
+    # Run both gates concurrently; results are still reported in order
+    warm_numba_kernels()
+    with ThreadPoolExecutor(max_workers=len(data_paths)) as executor:
+        futures = {
+            gate: executor.submit(run_optimization, path, gate, use_parquet_cache=True)
+            for gate, path in data_paths.items()
+        }
+    
+    for gate, future in futures.items():
         try:
-            results = run_optimization(path, gate)
-            print("\nResults:")
+            results = future.result()
+            print(f"\n{gate} gate results:")
             print(results['dataframe'])
             print(f"\nMaximum optimize_R: {results['max_optimize_r']}")
             print(f"Threshold: {results['threshold']}")